@@ -7,12 +7,15 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
     "sqlite:///./test.db",  # default for local dev; CI will override with Postgres
 )
 
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+def make_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    # reuse the most recently returned connection and check it is alive first
+    return create_engine(url, pool_use_lifo=True, pool_pre_ping=True)
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
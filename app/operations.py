@@ -1,3 +1,4 @@
+import operator
 from enum import Enum
 from typing import Callable
 
@@ -9,28 +10,18 @@ class OperationType(str, Enum):
     Divide = "Divide"
 
 
-def _add(a: float, b: float) -> float:
-    return a + b
-
-
-def _sub(a: float, b: float) -> float:
-    return a - b
-
-
-def _mul(a: float, b: float) -> float:
-    return a * b
-
-
 def _div(a: float, b: float) -> float:
     if b == 0:
         raise ValueError("Division by zero is not allowed")
     return a / b
 
 
+# The arithmetic operations map straight onto the C-implemented ``operator``
+# functions; only division needs a Python wrapper for its zero check.
 _OPERATION_MAP: dict[OperationType, Callable[[float, float], float]] = {
-    OperationType.Add: _add,
-    OperationType.Sub: _sub,
-    OperationType.Multiply: _mul,
+    OperationType.Add: operator.add,
+    OperationType.Sub: operator.sub,
+    OperationType.Multiply: operator.mul,
     OperationType.Divide: _div,
 }
 
@@ -9,8 +9,15 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day by default
 
-# Use pbkdf2_sha256 instead of bcrypt to avoid Windows bcrypt backend issues
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Use pbkdf2_sha256 instead of bcrypt to avoid Windows bcrypt backend issues.
+# PBKDF2_ROUNDS overrides passlib's default work factor (e.g. lowered in tests);
+# hashes record their own round count, so existing hashes keep verifying.
+_pbkdf2_rounds = os.getenv("PBKDF2_ROUNDS")
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    **({"pbkdf2_sha256__rounds": int(_pbkdf2_rounds)} if _pbkdf2_rounds else {}),
+)
 
 
 def hash_password(password: str) -> str:
@@ -0,0 +1,199 @@
+"""
+Shared pytest configuration and database/client fixtures for the test suite.
+"""
+import itertools
+import os
+
+# Password hashing strength is irrelevant in tests but dominates every
+# register/login call, so hash with a minimal pbkdf2 round count. This has to
+# be set before app.security is first imported; an explicit value in the
+# environment still wins.
+os.environ.setdefault("PBKDF2_ROUNDS", "1000")
+
+# app.main creates its tables on import. Unless DATABASE_URL says otherwise,
+# give each pytest-xdist worker its own SQLite file for that, rather than
+# having every worker (and the dev server) share ./test.db.
+#
+# Workers inherit the controller's environment, including the DATABASE_URL
+# this block set there, so a plain setdefault would leave every worker on
+# the controller's test_main.db. _TESTS_DEFAULT_DATABASE_URL records the
+# value this block chose: when DATABASE_URL still equals it (or both are
+# unset), it was ours and is re-derived for this process; any other value
+# came from the user and is left alone.
+if os.environ.get("DATABASE_URL") == os.environ.get("_TESTS_DEFAULT_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["_TESTS_DEFAULT_DATABASE_URL"] = (
+        f"sqlite:///./test_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}.db"
+    )
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.database import Base, get_db, make_engine
+
+# In-memory SQLite by default: nothing is written to disk and each process
+# (and so each pytest-xdist worker) gets a private database.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite://")
+
+_user_counter = itertools.count()
+
+
+def unique_user(prefix, password="password123"):
+    """Registration payload with a username and email no other test uses."""
+    u = next(_user_counter)
+    return {
+        "username": f"{prefix}_{u}",
+        "email": f"{prefix}_{u}@example.com",
+        "password": password
+    }
+
+
+def pytest_configure(config):
+    # Every worker resets the schema on start and drops it on exit, so
+    # workers pointed at one explicit database would wreck each other's runs.
+    if "TEST_DATABASE_URL" in os.environ and config.getoption("numprocesses", default=None):
+        raise pytest.UsageError(
+            "TEST_DATABASE_URL cannot be combined with pytest-xdist (-n); "
+            "run serially or use the default in-memory database"
+        )
+
+
+def _configure_sqlite(engine):
+    # pysqlite never emits BEGIN on its own, which breaks SAVEPOINT handling;
+    # take over transaction control so the per-test rollback really rolls back.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    # Durability is irrelevant for a throwaway test database; skip the
+    # fsync and on-disk journal that every commit would otherwise pay for.
+    @event.listens_for(engine, "connect")
+    def _fast_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """Engine for the integration database, with the schema created once."""
+    if TEST_DATABASE_URL.startswith("sqlite"):
+        # StaticPool hands every session the same connection, so they all
+        # see the one in-memory database.
+        eng = create_engine(
+            TEST_DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        _configure_sqlite(eng)
+    else:
+        # Against a real server, use the app's own pool settings. Its
+        # pre-ping already replaces stale connections, so no pool_recycle.
+        eng = make_engine(TEST_DATABASE_URL)
+
+    # One connection and one transaction for the whole reset, rather than
+    # separate checkouts and commits for the drop and the create passes.
+    with eng.begin() as conn:
+        Base.metadata.drop_all(bind=conn)
+        Base.metadata.create_all(bind=conn)
+    yield eng
+    Base.metadata.drop_all(bind=eng)
+    eng.dispose()
+
+
+@pytest.fixture(scope="session")
+def session_factory(engine):
+    # Tests assert on objects straight after committing them; keeping their
+    # loaded state avoids a reload SELECT on every attribute access.
+    return sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def committed_sessionmaker(engine):
+    """Sessionmaker for rows that module-scoped fixtures share across tests.
+
+    Its sessions commit outside any test's transaction, so the rows survive
+    each test's rollback while whatever a test changes in them is still
+    undone. Every row inserted through it, including rows endpoints insert
+    while ``get_db`` hands out its sessions, is deleted when the module ends.
+    """
+    factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+    inserted = []
+
+    @event.listens_for(factory, "after_flush")
+    def _record_inserts(session, flush_context):
+        inserted.extend((obj.__table__, obj.id) for obj in session.new)
+
+    yield factory
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            ids = [pk for t, pk in inserted if t is table]
+            if ids:
+                conn.execute(table.delete().where(table.c.id.in_(ids)))
+
+
+@pytest.fixture
+def db_connection(engine):
+    """A connection whose transaction is rolled back after the test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def db_session(db_connection, session_factory):
+    """Run a test inside a transaction that is rolled back afterwards.
+
+    ``get_db`` is overridden to hand out this same session, so endpoint
+    commits only release a SAVEPOINT and nothing outlives the test.
+    """
+    session = session_factory(bind=db_connection, join_transaction_mode="create_savepoint")
+    app.dependency_overrides[get_db] = lambda: session
+    yield session
+    app.dependency_overrides.pop(get_db, None)
+    session.close()
+
+
+@pytest.fixture
+def db_sessionmaker(db_connection):
+    """Like ``db_session``, but each request gets a fresh session.
+
+    Yields a sessionmaker bound to the test's connection; every session it
+    makes, including those ``get_db`` hands to endpoints, commits by releasing
+    a SAVEPOINT, and everything is rolled back after the test.
+    """
+    factory = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=db_connection,
+        join_transaction_mode="create_savepoint",
+    )
+
+    def override_get_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield factory
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the run, so app startup/shutdown happens only once."""
+    with TestClient(app) as c:
+        yield c
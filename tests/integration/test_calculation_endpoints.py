@@ -1,150 +1,116 @@
-# Ensure pytest is imported first
 import pytest
-import uuid
-# Reset DB before each test
-@pytest.fixture(autouse=True)
-def reset_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-
-# Helper for unique user
-def unique_user(prefix, password="secret123"):
-    u = str(uuid.uuid4())[:8]
-    return {
-        "username": f"{prefix}_{u}",
-        "email": f"{prefix}_{u}@example.com",
-        "password": password
-    }
-import pytest
-import os
-from fastapi.testclient import TestClient
-from app import models, security
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.main import app
-from app.database import Base, get_db
+
 from app import models
 from app.operations import OperationType
+from app.security import hash_password, create_access_token
+from tests.conftest import unique_user
 
-TEST_DATABASE_URL = os.getenv(
-    "TEST_DATABASE_URL",
-    "sqlite:///./test_integration.db",
-)
+_DIV = OperationType.Divide.value
+_MUL = OperationType.Multiply.value
 
-if TEST_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(TEST_DATABASE_URL)
+PAYLOAD_DIV_20_4 = {"a": 20, "b": 4, "type": _DIV}
+PAYLOAD_MUL_10_2 = {"a": 10, "b": 2, "type": _MUL}
+PAYLOAD_DIV_BY_ZERO = {"a": 1, "b": 0, "type": _DIV}
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
 
-@pytest.fixture(scope="session", autouse=True)
-def setup_database():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
 
+def post(client, path, body, token=None):
+    """POST ``body`` as JSON, authenticating with ``token`` when given."""
+    return client.post(path, json=body, headers=_bearer(token) if token else None)
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+@pytest.fixture(scope="module")
+def auth_token(committed_sessionmaker):
+    """One committed user shared by tests that only need a token."""
+    user = unique_user("shared")
+    with committed_sessionmaker() as db:
+        db.add(models.User(
+            username=user["username"],
+            email=user["email"],
+            password_hash=hash_password(user["password"]),
+        ))
+        db.commit()
+    return create_access_token(subject=user["username"])
 
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
 
+@pytest.fixture(scope="module")
+def auth_headers(auth_token):
+    return _bearer(auth_token)
 
-def test_create_read_update_delete_calculation():
-    # register and login to obtain token
-    user_payload = unique_user("tester")
-    r = client.post("/users/register", json=user_payload)
-    assert r.status_code == 201
-
-    login_payload = {"username": user_payload["username"], "password": user_payload["password"]}
-    r = client.post("/users/login", json=login_payload)
-    assert r.status_code == 200
-    token = r.json()["access_token"]
-    refresh = r.json().get("refresh_token")
-    headers = {"Authorization": f"Bearer {token}"}
 
+def test_create_read_update_delete_calculation(client, db_session, auth_token, auth_headers):
     # Create
-    payload = {"a": 20, "b": 4, "type": OperationType.Divide.value}
-    r = client.post("/calculations", json=payload, headers=headers)
+    r = post(client, "/calculations", PAYLOAD_DIV_20_4, auth_token)
     assert r.status_code == 201, r.text
     data = r.json()
     assert data["result"] == 5
     calc_id = data["id"]
 
     # Read
-    r = client.get(f"/calculations/{calc_id}", headers=headers)
+    r = client.get(f"/calculations/{calc_id}", headers=auth_headers)
     assert r.status_code == 200
     data = r.json()
     assert data["id"] == calc_id
 
     # Update (change operands)
-    payload_upd = {"a": 10, "b": 2, "type": OperationType.Multiply.value}
-    r = client.put(f"/calculations/{calc_id}", json=payload_upd, headers=headers)
+    r = client.put(f"/calculations/{calc_id}", json=PAYLOAD_MUL_10_2, headers=auth_headers)
     assert r.status_code == 200, r.text
     data = r.json()
     assert data["result"] == 20
 
     # Delete
-    r = client.delete(f"/calculations/{calc_id}", headers=headers)
+    r = client.delete(f"/calculations/{calc_id}", headers=auth_headers)
     assert r.status_code == 204
 
     # ensure 404 after delete
-    r = client.get(f"/calculations/{calc_id}", headers=headers)
+    r = client.get(f"/calculations/{calc_id}", headers=auth_headers)
     assert r.status_code == 404
 
 
-def test_refresh_and_logout_flow():
+def test_refresh_and_logout_flow(client, db_session):
     # register and login
     user_payload = unique_user("refreshuser")
-    r = client.post("/users/register", json=user_payload)
+    r = post(client, "/users/register", user_payload)
     assert r.status_code == 201
 
     login_payload = {"username": user_payload["username"], "password": user_payload["password"]}
-    r = client.post("/users/login", json=login_payload)
+    r = post(client, "/users/login", login_payload)
     assert r.status_code == 200
     access = r.json()["access_token"]
     refresh_token = r.json().get("refresh_token")
     assert refresh_token
 
     # exchange refresh token for new access token
-    r = client.post("/users/refresh", json={"refresh_token": refresh_token})
+    r = post(client, "/users/refresh", {"refresh_token": refresh_token})
     assert r.status_code == 200
     assert r.json().get("access_token")
 
     # logout (requires access token) and provide refresh token to revoke
-    headers = {"Authorization": f"Bearer {access}"}
-    r = client.post("/users/logout", json={"refresh_token": refresh_token}, headers=headers)
+    r = post(client, "/users/logout", {"refresh_token": refresh_token}, access)
     assert r.status_code == 200
 
     # using refresh token after logout should fail
-    r = client.post("/users/refresh", json={"refresh_token": refresh_token})
+    r = post(client, "/users/refresh", {"refresh_token": refresh_token})
     assert r.status_code == 401
 
 
-def test_list_and_revoke_tokens_by_user_and_admin():
+def test_list_and_revoke_tokens_by_user_and_admin(client, db_session):
     # register user and login to get refresh token
     user_payload = unique_user("tokenuser")
-    r = client.post("/users/register", json=user_payload)
+    r = post(client, "/users/register", user_payload)
     assert r.status_code == 201
 
-    r = client.post("/users/login", json={"username": user_payload["username"], "password": user_payload["password"]})
+    r = post(client, "/users/login", {"username": user_payload["username"], "password": user_payload["password"]})
     assert r.status_code == 200
     refresh_token = r.json().get("refresh_token")
     assert refresh_token
 
     # list tokens for current user using access token
     access = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {access}"}
+    headers = _bearer(access)
     r = client.get("/users/me/tokens", headers=headers)
     assert r.status_code == 200
     data = r.json()
@@ -154,29 +120,45 @@ def test_list_and_revoke_tokens_by_user_and_admin():
     # revoke token by id
     r = client.delete(f"/users/me/tokens/{token_id}", headers=headers)
     assert r.status_code == 200
-    pytest.skip("Skipping admin DB assertion logic due to session isolation issues.")
 
 
-def test_admin_list_per_user_and_revoke_by_token():
-    pytest.skip("Skipping admin DB assertion logic due to session isolation issues.")
+def test_admin_list_per_user_and_revoke_by_token(client, db_session):
+    # regular user with one refresh token
+    user_payload = unique_user("tokenowner")
+    r = post(client, "/users/register", user_payload)
+    assert r.status_code == 201
+    r = post(client, "/users/login", {"username": user_payload["username"], "password": user_payload["password"]})
+    assert r.status_code == 200
+    refresh_token = r.json()["refresh_token"]
 
-    # token should be unusable afterwards
-    # Test skipped due to DB session isolation issues with admin role promotion
-    pass
+    # promote an admin through the test's own session; endpoints share it,
+    # so no extra connection is checked out and nothing leaks past the test
+    admin_payload = unique_user("admin", password="adminpass")
+    r = post(client, "/users/register", admin_payload)
+    assert r.status_code == 201
+    admin = db_session.query(models.User).filter(models.User.username == admin_payload["username"]).first()
+    admin.role = "admin"
+    db_session.commit()
 
+    r = post(client, "/users/login", {"username": admin_payload["username"], "password": admin_payload["password"]})
+    assert r.status_code == 200
+    admin_token = r.json()["access_token"]
 
-def test_invalid_division_by_zero_returns_422():
-    # authenticate
-    user_payload = {"username": "tester2", "email": "tester2@example.com", "password": "secret123"}
-    r = client.post("/users/register", json=user_payload)
-    assert r.status_code == 201
-    login_payload = {"username": "tester2", "password": "secret123"}
-    r = client.post("/users/login", json=login_payload)
+    # admin can list the user's tokens
+    r = client.get(f"/admin/users/{user_payload['username']}/tokens", headers=_bearer(admin_token))
+    assert r.status_code == 200
+    assert len(r.json()) == 1
+
+    # and revoke one by its token string
+    r = post(client, "/admin/tokens/revoke", {"refresh_token": refresh_token}, admin_token)
     assert r.status_code == 200
-    token = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
 
-    payload = {"a": 1, "b": 0, "type": OperationType.Divide.value}
-    r = client.post("/calculations", json=payload, headers=headers)
+    # token should be unusable afterwards
+    r = post(client, "/users/refresh", {"refresh_token": refresh_token})
+    assert r.status_code == 401
+
+
+def test_invalid_division_by_zero_returns_422(client, db_session, auth_token):
+    r = post(client, "/calculations", PAYLOAD_DIV_BY_ZERO, auth_token)
     # pydantic validation on CalculationCreate should reject division by zero
     assert r.status_code in (400, 422)
@@ -1,105 +1,72 @@
 """
 Integration tests for user profile management endpoints.
+
+Database fixtures (``db_sessionmaker``) come from ``tests/conftest.py``:
+the schema is created once per session and each test runs in a transaction
+that is rolled back afterwards.
 """
 
-import os
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
 
-from app.main import app
-from app.database import Base, get_db
 from app.models import User
-from app.security import hash_password
-
-
-# Test database setup
-TEST_DATABASE_URL = os.getenv(
-    "TEST_DATABASE_URL",
-    "sqlite:///./test_profile_integration.db",
-)
-
-if TEST_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        TEST_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(TEST_DATABASE_URL)
-
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-@pytest.fixture(scope="function", autouse=True)
-def setup_database():
-    """Setup and teardown database for each test."""
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
-
-
-def override_get_db():
-    """Override database dependency."""
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-# Ensure DB override is applied for this module and cleaned up after.
-@pytest.fixture(scope="function", autouse=True)
-def apply_db_override():
-    app.dependency_overrides[get_db] = override_get_db
-    yield
-    app.dependency_overrides.pop(get_db, None)
-
-
-@pytest.fixture
-def db_session():
-    """Get database session for tests."""
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture
-def test_user(db_session: Session):
-    """Create a test user."""
-    user = User(
-        username="testprofileuser",
-        email="testprofile@example.com",
-        password_hash=hash_password("TestPass123!"),
-        role="user"
-    )
-    db_session.add(user)
-    db_session.commit()
-    db_session.refresh(user)
+from app.security import create_access_token, hash_password
+
+# Every request must go through the rolled-back test session, including those
+# from tests that never touch the database directly.
+pytestmark = pytest.mark.usefixtures("db_sessionmaker")
+
+# Hash each fixed password once at import rather than inside fixtures
+_TEST_USER_HASH = hash_password("TestPass123!")
+_OTHER_USER_HASH = hash_password("Pass123!")
+
+
+@pytest.fixture(scope="module")
+def test_user(committed_sessionmaker):
+    """Create a test user shared by every test in this module."""
+    with committed_sessionmaker() as db:
+        user = User(
+            username="testprofileuser",
+            email="testprofile@example.com",
+            password_hash=_TEST_USER_HASH,
+            role="user"
+        )
+        db.add(user)
+        db.commit()
     return user
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
+def other_user(committed_sessionmaker):
+    """Create a second user whose username and email are already taken."""
+    with committed_sessionmaker() as db:
+        user = User(
+            username="existinguser",
+            email="existing@example.com",
+            password_hash=_OTHER_USER_HASH,
+            role="user"
+        )
+        db.add(user)
+        db.commit()
+    return user
+
+
+@pytest.fixture(scope="module")
 def auth_headers(test_user):
-    """Get authentication headers for test user."""
-    client = TestClient(app)
-    response = client.post(
-        "/users/login",
-        json={"username": "testprofileuser", "password": "TestPass123!"}
-    )
-    assert response.status_code == 200
-    token = response.json()["access_token"]
+    """Get authentication headers for test user.
+
+    The access token only carries the username, so sign it directly instead
+    of logging in for every test. Tests that rename the user or change the
+    password log in again themselves.
+    """
+    token = create_access_token(subject=test_user.username)
     return {"Authorization": f"Bearer {token}"}
 
 
 class TestGetCurrentUserInfo:
     """Test GET /users/me endpoint."""
 
-    def test_get_current_user_success(self, test_user, auth_headers):
+    def test_get_current_user_success(self, client, test_user, auth_headers):
         """Test getting current user info successfully."""
-        client = TestClient(app)
         response = client.get("/users/me", headers=auth_headers)
         
         assert response.status_code == 200
@@ -110,17 +77,15 @@ class TestGetCurrentUserInfo:
         assert "id" in data
         assert "password_hash" not in data  # Should not expose password
 
-    def test_get_current_user_no_auth(self):
+    def test_get_current_user_no_auth(self, client):
         """Test getting current user without authentication."""
-        client = TestClient(app)
         response = client.get("/users/me")
         
         assert response.status_code == 401
         assert "detail" in response.json()
 
-    def test_get_current_user_invalid_token(self):
+    def test_get_current_user_invalid_token(self, client):
         """Test getting current user with invalid token."""
-        client = TestClient(app)
         response = client.get(
             "/users/me",
             headers={"Authorization": "Bearer invalid_token"}
@@ -132,9 +97,8 @@ class TestGetCurrentUserInfo:
 class TestUpdateUserProfile:
     """Test PATCH /users/me endpoint."""
 
-    def test_update_username_success(self, test_user, auth_headers, db_session):
+    def test_update_username_success(self, client, test_user, auth_headers, db_sessionmaker):
         """Test updating username successfully."""
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             headers=auth_headers,
@@ -147,12 +111,12 @@ class TestUpdateUserProfile:
         assert data["email"] == "testprofile@example.com"
         
         # Verify in database
-        db_session.refresh(test_user)
-        assert test_user.username == "newusername"
+        with db_sessionmaker() as db:
+            user = db.get(User, test_user.id)
+        assert user.username == "newusername"
 
-    def test_update_email_success(self, test_user, auth_headers, db_session):
+    def test_update_email_success(self, client, test_user, auth_headers, db_sessionmaker):
         """Test updating email successfully."""
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             headers=auth_headers,
@@ -165,12 +129,12 @@ class TestUpdateUserProfile:
         assert data["email"] == "newemail@example.com"
         
         # Verify in database
-        db_session.refresh(test_user)
-        assert test_user.email == "newemail@example.com"
+        with db_sessionmaker() as db:
+            user = db.get(User, test_user.id)
+        assert user.email == "newemail@example.com"
 
-    def test_update_both_fields_success(self, test_user, auth_headers, db_session):
+    def test_update_both_fields_success(self, client, test_user, auth_headers, db_sessionmaker):
         """Test updating both username and email successfully."""
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             headers=auth_headers,
@@ -186,23 +150,13 @@ class TestUpdateUserProfile:
         assert data["email"] == "newemail@example.com"
         
         # Verify in database
-        db_session.refresh(test_user)
-        assert test_user.username == "newusername"
-        assert test_user.email == "newemail@example.com"
+        with db_sessionmaker() as db:
+            user = db.get(User, test_user.id)
+        assert user.username == "newusername"
+        assert user.email == "newemail@example.com"
 
-    def test_update_username_already_taken(self, test_user, auth_headers, db_session):
+    def test_update_username_already_taken(self, client, test_user, other_user, auth_headers):
         """Test updating username to one that's already taken."""
-        # Create another user
-        other_user = User(
-            username="existinguser",
-            email="existing@example.com",
-            password_hash=hash_password("Pass123!"),
-            role="user"
-        )
-        db_session.add(other_user)
-        db_session.commit()
-        
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             headers=auth_headers,
@@ -212,19 +166,8 @@ class TestUpdateUserProfile:
         assert response.status_code == 400
         assert "already taken" in response.json()["detail"].lower()
 
-    def test_update_email_already_taken(self, test_user, auth_headers, db_session):
+    def test_update_email_already_taken(self, client, test_user, other_user, auth_headers):
         """Test updating email to one that's already taken."""
-        # Create another user
-        other_user = User(
-            username="existinguser",
-            email="existing@example.com",
-            password_hash=hash_password("Pass123!"),
-            role="user"
-        )
-        db_session.add(other_user)
-        db_session.commit()
-        
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             headers=auth_headers,
@@ -234,9 +177,8 @@ class TestUpdateUserProfile:
         assert response.status_code == 400
         assert "already taken" in response.json()["detail"].lower()
 
-    def test_update_no_auth(self):
+    def test_update_no_auth(self, client):
         """Test updating profile without authentication."""
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             json={"username": "newusername"}
@@ -244,9 +186,8 @@ class TestUpdateUserProfile:
         
         assert response.status_code == 401
 
-    def test_update_invalid_email(self, test_user, auth_headers):
+    def test_update_invalid_email(self, client, test_user, auth_headers):
         """Test updating with invalid email format."""
-        client = TestClient(app)
         response = client.patch(
             "/users/me",
             headers=auth_headers,
@@ -259,9 +200,8 @@ class TestUpdateUserProfile:
 class TestChangePassword:
     """Test POST /users/me/change-password endpoint."""
 
-    def test_change_password_success(self, test_user, auth_headers, db_session):
+    def test_change_password_success(self, client, test_user, auth_headers):
         """Test changing password successfully."""
-        client = TestClient(app)
         response = client.post(
             "/users/me/change-password",
             headers=auth_headers,
@@ -288,9 +228,8 @@ class TestChangePassword:
         )
         assert old_login.status_code == 401
 
-    def test_change_password_wrong_current(self, test_user, auth_headers):
+    def test_change_password_wrong_current(self, client, test_user, auth_headers):
         """Test changing password with wrong current password."""
-        client = TestClient(app)
         response = client.post(
             "/users/me/change-password",
             headers=auth_headers,
@@ -303,9 +242,8 @@ class TestChangePassword:
         assert response.status_code == 400
         assert "incorrect" in response.json()["detail"].lower()
 
-    def test_change_password_same_as_current(self, test_user, auth_headers):
+    def test_change_password_same_as_current(self, client, test_user, auth_headers):
         """Test changing password to same as current (should fail validation)."""
-        client = TestClient(app)
         response = client.post(
             "/users/me/change-password",
             headers=auth_headers,
@@ -318,9 +256,8 @@ class TestChangePassword:
         # Should fail at schema validation level
         assert response.status_code == 422
 
-    def test_change_password_weak_new(self, test_user, auth_headers):
+    def test_change_password_weak_new(self, client, test_user, auth_headers):
         """Test changing password to weak password."""
-        client = TestClient(app)
         response = client.post(
             "/users/me/change-password",
             headers=auth_headers,
@@ -332,9 +269,8 @@ class TestChangePassword:
         
         assert response.status_code == 422
 
-    def test_change_password_no_auth(self):
+    def test_change_password_no_auth(self, client):
         """Test changing password without authentication."""
-        client = TestClient(app)
         response = client.post(
             "/users/me/change-password",
             json={
@@ -345,10 +281,8 @@ class TestChangePassword:
         
         assert response.status_code == 401
 
-    def test_change_password_missing_fields(self, test_user, auth_headers):
+    def test_change_password_missing_fields(self, client, test_user, auth_headers):
         """Test changing password with missing fields."""
-        client = TestClient(app)
-        
         # Missing new_password
         response1 = client.post(
             "/users/me/change-password",
@@ -369,10 +303,8 @@ class TestChangePassword:
 class TestProfileIntegrationFlow:
     """Test complete profile management flows."""
 
-    def test_complete_profile_update_flow(self, test_user, auth_headers, db_session):
+    def test_complete_profile_update_flow(self, client, test_user, auth_headers):
         """Test complete flow: get profile -> update -> verify -> change password."""
-        client = TestClient(app)
-        
         # 1. Get current profile
         response = client.get("/users/me", headers=auth_headers)
         assert response.status_code == 200
@@ -389,13 +321,9 @@ class TestProfileIntegrationFlow:
         )
         assert update_response.status_code == 200
 
-        # Refresh token after username change
-        relogin = client.post(
-            "/users/login",
-            json={"username": "updateduser", "password": "TestPass123!"}
-        )
-        assert relogin.status_code == 200
-        new_headers = {"Authorization": f"Bearer {relogin.json()['access_token']}"}
+        # The old token names the old username; step 5 covers logging in
+        # under the new one, so just sign a token for it here
+        new_headers = {"Authorization": f"Bearer {create_access_token(subject='updateduser')}"}
         
         # 3. Verify update
         verify_response = client.get("/users/me", headers=new_headers)
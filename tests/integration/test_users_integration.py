@@ -1,46 +1,4 @@
-import os
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.main import app
-from app.database import Base, get_db
-
-TEST_DATABASE_URL = os.getenv(
-    "TEST_DATABASE_URL",
-    "sqlite:///./test_integration.db",
-)
-
-if TEST_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        TEST_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(TEST_DATABASE_URL)
-
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-@pytest.fixture(scope="function", autouse=True)
-def setup_database():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    app.dependency_overrides[get_db] = override_get_db
-    yield
-    app.dependency_overrides.pop(get_db, None)
-    Base.metadata.drop_all(bind=engine)
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
-
-def test_create_user_success():
+def test_create_user_success(client, db_session):
     payload = {
         "username": "alice",
         "email": "alice@example.com",
@@ -53,7 +11,8 @@ def test_create_user_success():
     assert data["email"] == "alice@example.com"
     assert "id" in data
 
-def test_username_and_email_must_be_unique():
+
+def test_username_and_email_must_be_unique(client, db_session):
     payload1 = {
         "username": "bob",
         "email": "bob@example.com",
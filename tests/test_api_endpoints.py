@@ -1,66 +1,20 @@
-# Ensure pytest is imported first
 import pytest
-import uuid
-# Reset DB before each test
-@pytest.fixture(autouse=True)
-def reset_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
 
-# Helper for unique user
-def unique_user(prefix, password="supersecret"):
-    u = str(uuid.uuid4())[:8]
-    return {
-        "username": f"{prefix}_{u}",
-        "email": f"{prefix}_{u}@example.com",
-        "password": password
-    }
-import pytest
-import os
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.main import app
-from app.database import Base, get_db
-from app import models, security
-
-TEST_DATABASE_URL = os.getenv(
-    "TEST_DATABASE_URL",
-    "sqlite:///./test_integration.db",
-)
-
-if TEST_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        TEST_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(TEST_DATABASE_URL)
-
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app import models
+from app.security import hash_password
+from tests.conftest import unique_user
 
+# The engine, schema, ``db_session`` and ``client`` fixtures live in
+# tests/conftest.py; every test here runs in a transaction that is rolled
+# back afterwards.
+pytestmark = pytest.mark.usefixtures("db_session")
 
-@pytest.fixture(scope="session", autouse=True)
-def setup_database():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+# Seeded users all share one password, so hash it once for the module
+_PASSWORD = "supersecret"
+_PASSWORD_HASH = hash_password(_PASSWORD)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
-
-
-def test_create_user_success():
+def test_create_user_success(client):
     payload = unique_user("alice")
     resp = client.post("/users/", json=payload)
     assert resp.status_code == 201, resp.text
@@ -70,10 +24,9 @@ def test_create_user_success():
     assert "id" in data
 
 
-def test_username_and_email_must_be_unique():
-    base = str(uuid.uuid4())[:8]
-    payload1 = {"username": f"bob_{base}", "email": f"bob_{base}@example.com", "password": "supersecret"}
-    payload2 = {"username": f"bob_{base}", "email": f"bob2_{base}@example.com", "password": "supersecret"}
+def test_username_and_email_must_be_unique(client):
+    payload1 = unique_user("bob")
+    payload2 = {**unique_user("bob2"), "username": payload1["username"]}
     r1 = client.post("/users/", json=payload1)
     assert r1.status_code == 201
     r2 = client.post("/users/", json=payload2)
@@ -81,8 +34,19 @@ def test_username_and_email_must_be_unique():
     assert "already registered" in r2.json()["detail"]
 
 
-def test_list_users_returns_created_users():
-    pytest.skip("Skipping admin DB assertion logic due to session isolation issues.")
+def test_list_users_returns_created_users(client, db_session):
+    # Seed the users directly; only the calls under test go through HTTP
+    user_payload = unique_user("charlie", password=_PASSWORD)
+    admin_payload = unique_user("admin", password=_PASSWORD)
+    db_session.add_all([
+        models.User(username=user_payload["username"], email=user_payload["email"], password_hash=_PASSWORD_HASH),
+        models.User(username=admin_payload["username"], email=admin_payload["email"], password_hash=_PASSWORD_HASH, role="admin"),
+    ])
+    db_session.commit()
+
+    r = client.post("/users/login", json={"username": admin_payload["username"], "password": admin_payload["password"]})
+    assert r.status_code == 200, r.text
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
 
     resp = client.get("/users/", headers=headers)
     assert resp.status_code == 200
@@ -90,5 +54,4 @@ def test_list_users_returns_created_users():
     assert isinstance(data, list)
     usernames = [u["username"] for u in data]
     assert user_payload["username"] in usernames
-    # Test skipped due to DB session isolation issues with admin role promotion
-    pass
+    assert admin_payload["username"] in usernames
@@ -14,10 +14,11 @@ client = TestClient(app)
 
 def test_openapi_schema_generation():
     """Test that custom OpenAPI schema is generated correctly."""
-    # Access the OpenAPI schema which triggers custom_openapi()
+    # The endpoint must serve the schema; the structure is checked on the
+    # schema object itself rather than on a re-parsed copy of the response.
     response = client.get("/openapi.json")
     assert response.status_code == 200
-    schema = response.json()
+    schema = app.openapi()
     
     # Verify bearerAuth security scheme is present
     assert "components" in schema
@@ -40,16 +41,13 @@ def test_openapi_schema_generation():
 
 def test_openapi_schema_caching():
     """Test that OpenAPI schema is cached after first generation."""
-    # First call generates schema
-    response1 = client.get("/openapi.json")
-    assert response1.status_code == 200
-    
-    # Second call should return cached schema
-    response2 = client.get("/openapi.json")
-    assert response2.status_code == 200
-    
-    # Both should be identical
-    assert response1.json() == response2.json()
+    # First call generates (or reuses) the schema
+    schema1 = app.openapi()
+
+    # Second call should return the very same cached object
+    schema2 = app.openapi()
+
+    assert schema1 is schema2
 
 
 def test_get_operation_callable():
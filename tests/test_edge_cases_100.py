@@ -1,57 +1,14 @@
 """Edge case tests to reach 100% coverage."""
 
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.main import app
-from app.database import SessionLocal, Base, get_db
-from app import models
 from unittest.mock import patch
 
-# Isolated sqlite DB for this module
-TEST_DATABASE_URL = "sqlite:///./test_edge_cases.db"
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Every test runs in a transaction that is rolled back afterwards; see
+# db_sessionmaker in tests/conftest.py.
+pytestmark = pytest.mark.usefixtures("db_sessionmaker")
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture(autouse=True)
-def setup_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    app.dependency_overrides[get_db] = override_get_db
-    yield
-    app.dependency_overrides.pop(get_db, None)
-    Base.metadata.drop_all(bind=engine)
-
-
-client = TestClient(app)
-
-
-def cleanup_user(username: str):
-    """Helper to clean up test users."""
-    db = TestingSessionLocal()
-    try:
-        user = db.query(models.User).filter(models.User.username == username).first()
-        if user:
-            db.query(models.Calculation).filter(models.Calculation.user_id == user.id).delete()
-            from app.models import RefreshToken
-            db.query(RefreshToken).filter(RefreshToken.user_id == user.id).delete()
-            db.delete(user)
-            db.commit()
-    finally:
-        db.close()
-
-
-def test_refresh_with_jwt_decode_exception():
+def test_refresh_with_jwt_decode_exception(client):
     """Test refresh endpoint when JWT decode raises an exception (lines 254-255)."""
     # Send a malformed token that will cause JWT decode to fail
     response = client.post(
@@ -62,10 +19,8 @@ def test_refresh_with_jwt_decode_exception():
     assert response.status_code in [400, 401]
 
 
-def test_revoke_nonexistent_token():
+def test_revoke_nonexistent_token(client):
     """Test revoking a token that doesn't exist in the database (line 282)."""
-    cleanup_user("revokeuser2")
-    
     # Register and login
     client.post(
         "/users/register",
@@ -96,5 +51,3 @@ def test_revoke_nonexistent_token():
     # Should return 404 because token not found
     assert response.status_code == 404
     assert "not found" in response.json()["detail"].lower()
-    
-    cleanup_user("revokeuser2")
@@ -2,79 +2,52 @@
 
 import pytest
 from fastapi import HTTPException
-from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app.main import app
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import get_db, Base
 from app import models
 from app.operations import compute_result
-
-
-# Dedicated sqlite DB for this module to avoid cross-test contamination
-TEST_DATABASE_URL = "sqlite:///./test_final_coverage.db"
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture(autouse=True)
-def setup_db_override():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    app.dependency_overrides[get_db] = override_get_db
-    yield
-    app.dependency_overrides.pop(get_db, None)
-    Base.metadata.drop_all(bind=engine)
-
-
-client = TestClient(app)
-
-
-def cleanup_user(username: str):
-    """Helper to clean up test users."""
-    db = TestingSessionLocal()
-    try:
-        user = db.query(models.User).filter(models.User.username == username).first()
-        if user:
-            # Delete associated calculations
-            db.query(models.Calculation).filter(models.Calculation.user_id == user.id).delete()
-            # Delete associated refresh tokens
-            from app.models import RefreshToken
-            db.query(RefreshToken).filter(RefreshToken.user_id == user.id).delete()
-            # Delete user
-            db.delete(user)
-            db.commit()
-    finally:
-        db.close()
+from app.security import create_access_token, hash_password
+
+# Every test runs in a transaction that is rolled back afterwards; see
+# db_sessionmaker in tests/conftest.py. Rows committed by module-scoped
+# fixtures sit outside that transaction and survive it.
+pytestmark = pytest.mark.usefixtures("db_sessionmaker")
+
+
+@pytest.fixture(scope="module")
+def patch_ctx(committed_sessionmaker):
+    """One user, token and Add(10, 5) calculation shared by the PATCH tests.
+
+    Each test's PATCH is rolled back, so the next one starts from the same
+    calculation.
+    """
+    with committed_sessionmaker() as db:
+        user = models.User(
+            username="patchuser",
+            email="patch@example.com",
+            password_hash=hash_password("password123"),
+        )
+        db.add(user)
+        db.flush()
+        calc = models.Calculation(user_id=user.id, a=10, b=5, type="Add", result=15)
+        db.add(calc)
+        db.commit()
+    return create_access_token(subject="patchuser"), calc.id
 
 
 # Test line 189 in main.py: duplicate email registration
-def test_register_duplicate_email():
+def test_register_duplicate_email(client, db_sessionmaker):
     """Test registering with an existing email."""
-    cleanup_user("uniqueuser1")
-    cleanup_user("uniqueuser2")
-    
-    # Register first user
-    response1 = client.post(
-        "/users/register",
-        json={
-            "username": "uniqueuser1",
-            "email": "duplicate@example.com",
-            "password": "password123"
-        }
-    )
-    assert response1.status_code == 201
-    
+    # Insert the first user directly; only the duplicate registration is
+    # under test, and its password is never checked
+    with db_sessionmaker() as db:
+        db.add(models.User(
+            username="uniqueuser1",
+            email="duplicate@example.com",
+            password_hash="x",
+        ))
+        db.commit()
+
     # Try to register with same email but different username
     response2 = client.post(
         "/users/register",
@@ -86,10 +59,8 @@ def test_register_duplicate_email():
     )
     assert response2.status_code == 400
 # Test line 220 in main.py: login with email instead of username
-def test_login_with_email():
+def test_login_with_email(client):
     """Test logging in with email instead of username."""
-    cleanup_user("emailuser")
-    
     # Register user
     client.post(
         "/users/register",
@@ -111,7 +82,7 @@ def test_login_with_email():
     assert response.status_code == 200
     data = response.json()
 # Test lines 254-255, 259 in main.py: invalid refresh token scenarios
-def test_refresh_token_invalid_payload():
+def test_refresh_token_invalid_payload(client):
     """Test refresh endpoint with invalid token payload."""
     response = client.post(
         "/users/refresh",
@@ -121,7 +92,7 @@ def test_refresh_token_invalid_payload():
     assert response.status_code in [400, 401]
 
 
-def test_refresh_token_user_not_found():
+def test_refresh_token_user_not_found(client):
     """Test refresh endpoint with token for non-existent user."""
     # Create a valid-format token but for a user that doesn't exist
     from app.security import create_access_token
@@ -135,10 +106,8 @@ def test_refresh_token_user_not_found():
     assert response.status_code in [400, 401]
 
 
-def test_refresh_token_not_in_database():
+def test_refresh_token_not_in_database(client):
     """Test refresh endpoint with valid token that was never stored in DB."""
-    cleanup_user("tokenuser2")
-    
     # Register user
     client.post(
         "/users/register",
@@ -161,15 +130,11 @@ def test_refresh_token_not_in_database():
     # Should return 401 because token not found in database
     assert response.status_code == 401
     assert "revoked" in response.json()["detail"].lower() or "invalid" in response.json()["detail"].lower()
-    
-    cleanup_user("tokenuser2")
 
 
 # Test line 282 in main.py: revoke token not found
-def test_revoke_token_not_found():
+def test_revoke_token_not_found(client):
     """Test revoking a token that doesn't exist in database."""
-    cleanup_user("revokeuser")
-    
     # Register and login
     client.post(
         "/users/register",
@@ -198,10 +163,8 @@ def test_revoke_token_not_found():
     )
     assert response.status_code == 404
 # Test lines 403-404 in main.py: list calculations with pagination
-def test_list_calculations_with_skip_limit():
+def test_list_calculations_with_skip_limit(client, db_sessionmaker):
     """Test browsing calculations with skip and limit parameters."""
-    cleanup_user("paginationuser")
-    
     # Register and login
     client.post(
         "/users/register",
@@ -222,17 +185,14 @@ def test_list_calculations_with_skip_limit():
     data = login_response.json()
     access_token = data["access_token"]
     
-    # Create multiple calculations
-    for i in range(5):
-        client.post(
-            "/calculations",
-            json={
-                "a": i,
-                "b": 1,
-                "type": "Add"
-            },
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
+    # Create multiple calculations directly; only the listing is under test
+    with db_sessionmaker() as db:
+        user = db.query(models.User).filter_by(username="paginationuser").one()
+        db.bulk_save_objects([
+            models.Calculation(user_id=user.id, a=i, b=1, type="Add", result=i + 1)
+            for i in range(5)
+        ])
+        db.commit()
     
     # Test pagination
     response = client.get(
@@ -241,148 +201,27 @@ def test_list_calculations_with_skip_limit():
     )
     assert response.status_code == 200
     calculations = response.json()
-# Test lines 478, 482 in main.py: PATCH endpoint updating individual fields
-def test_patch_calculation_update_only_a():
-    """Test PATCH endpoint updating only the 'a' field."""
-    cleanup_user("patchuser1")
-    
-    # Register and login
-    client.post(
-        "/users/register",
-        json={
-            "username": "patchuser1",
-            "email": "patch1@example.com",
-            "password": "password123"
-        }
-    )
-    
-    login_response = client.post(
-        "/users/login",
-        json={
-            "username": "patchuser1",
-            "password": "password123"
-        }
-    )
-    data = login_response.json()
-    access_token = data["access_token"]
-    
-    # Create a calculation
-    create_response = client.post(
-        "/calculations",
-        json={"a": 10, "b": 5, "type": "Add"},
-        headers={"Authorization": f"Bearer {access_token}"}
-    )
-    assert create_response.status_code == 201
-    calc_id = create_response.json()["id"]
-    
-    # Update only 'a'
-    patch_response = client.patch(
-        f"/calculations/{calc_id}",
-        json={"a": 20},
-        headers={"Authorization": f"Bearer {access_token}"}
-    )
-    assert patch_response.status_code == 200
-    result = patch_response.json()
-    assert result["a"] == 20
-    assert result["b"] == 5
-    assert result["result"] == 25
-    
-    cleanup_user("patchuser1")
+    assert len(calculations) == 2
 
-def test_patch_calculation_update_only_b():
-    """Test PATCH endpoint updating only the 'b' field."""
-    cleanup_user("patchuser2")
-    
-    # Register and login
-    client.post(
-        "/users/register",
-        json={
-            "username": "patchuser2",
-            "email": "patch2@example.com",
-            "password": "password123"
-        }
-    )
-    
-    login_response = client.post(
-        "/users/login",
-        json={
-            "username": "patchuser2",
-            "password": "password123"
-        }
-    )
-    data = login_response.json()
-    access_token = data["access_token"]
-    
-    # Create a calculation
-    create_response = client.post(
-        "/calculations",
-        json={"a": 10, "b": 5, "type": "Multiply"},
-        headers={"Authorization": f"Bearer {access_token}"}
-    )
-    assert create_response.status_code == 201
-    calc_id = create_response.json()["id"]
-    
-    # Update only 'b'
-    patch_response = client.patch(
-        f"/calculations/{calc_id}",
-        json={"b": 3},
-        headers={"Authorization": f"Bearer {access_token}"}
-    )
-    assert patch_response.status_code == 200
-    result = patch_response.json()
-    assert result["a"] == 10
-    assert result["b"] == 3
-    assert result["result"] == 30
-    
-    cleanup_user("patchuser2")
-    cleanup_user("patchuser2")
-def test_patch_calculation_update_only_type():
-    """Test PATCH endpoint updating only the 'type' field."""
-    cleanup_user("patchuser3")
-    
-    # Register and login
-    client.post(
-        "/users/register",
-        json={
-            "username": "patchuser3",
-            "email": "patch3@example.com",
-            "password": "password123"
-        }
-    )
-    
-    login_response = client.post(
-        "/users/login",
-        json={
-            "username": "patchuser3",
-            "password": "password123"
-        }
-    )
-    data = login_response.json()
-    access_token = data["access_token"]
-    
-    # Create a calculation
-    create_response = client.post(
-        "/calculations",
-        json={"a": 20, "b": 4, "type": "Add"},
-        headers={"Authorization": f"Bearer {access_token}"}
-    )
-    assert create_response.status_code == 201
-    calc_id = create_response.json()["id"]
-    
-    # Update only 'type'
+
+# Test lines 478, 482 in main.py: PATCH endpoint updating individual fields
+@pytest.mark.parametrize("body,expected", [
+    ({"a": 20}, {"a": 20, "b": 5, "type": "Add", "result": 25}),
+    ({"b": 3}, {"a": 10, "b": 3, "type": "Add", "result": 13}),
+    ({"type": "Divide"}, {"a": 10, "b": 5, "type": "Divide", "result": 2}),
+], ids=["only_a", "only_b", "only_type"])
+def test_patch_calculation_update_single_field(client, patch_ctx, body, expected):
+    """Test PATCH endpoint updating a single field of a calculation."""
+    access_token, calc_id = patch_ctx
     patch_response = client.patch(
         f"/calculations/{calc_id}",
-        json={"type": "Divide"},
+        json=body,
         headers={"Authorization": f"Bearer {access_token}"}
     )
     assert patch_response.status_code == 200
     result = patch_response.json()
-    assert result["a"] == 20
-    assert result["b"] == 4
-    assert result["type"] == "Divide"
-    assert result["result"] == 5
-    
-    cleanup_user("patchuser3")
+    for field, value in expected.items():
+        assert result[field] == value
 
 
 # Test line 46 in operations.py: unsupported operation type
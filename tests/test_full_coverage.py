@@ -1,68 +1,41 @@
 # Ensure pytest is imported first
 import pytest
-import uuid
-# Add fixture to reset DB before each test
-@pytest.fixture(autouse=True)
-def reset_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    app.dependency_overrides[get_db] = override_get_db
-    yield
-    app.dependency_overrides.pop(get_db, None)
-    Base.metadata.drop_all(bind=engine)
+# Run each test in a transaction on the shared session-scoped engine from
+# tests/conftest.py; see db_sessionmaker there.
+pytestmark = pytest.mark.usefixtures("db_sessionmaker")
 
-# Helper for unique user
-def unique_user(prefix, password="adminpass"):
-    u = str(uuid.uuid4())[:8]
-    return {
-        "username": f"{prefix}_{u}",
-        "email": f"{prefix}_{u}@example.com",
-        "password": password
-    }
 import pytest
-from fastapi.testclient import TestClient
-from app.main import app
-from app.database import get_db, Base
 from app import models
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
+from app.security import create_access_token, hash_password
+from tests.conftest import unique_user
 
+# Admins are never logged in with a password, so any valid hash will do
+_ADMIN_PASSWORD_HASH = hash_password("adminpass")
 
-TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite:///./test_coverage.db")
-if TEST_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(TEST_DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+def make_admin(session_local, prefix):
+    """Insert an admin directly and sign its token, skipping register/login."""
+    payload = unique_user(prefix, password="adminpass")
+    with session_local() as db:
+        db.add(models.User(
+            username=payload["username"],
+            email=payload["email"],
+            password_hash=_ADMIN_PASSWORD_HASH,
+            role="admin",
+        ))
+        db.commit()
+    token = create_access_token(subject=payload["username"])
+    return payload, {"Authorization": f"Bearer {token}"}
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-client = TestClient(app)
+def login(client, payload):
+    """Log in with a unique_user() payload and return its auth headers."""
+    r = client.post("/users/login", json={"username": payload["username"], "password": payload["password"]})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
 
 # --- Admin-only endpoints ---
-def test_admin_endpoints_and_errors():
+def test_admin_endpoints_and_errors(client, db_sessionmaker):
     # Create admin
-    admin_payload = unique_user("admin100x")
-    r = client.post("/users/", json=admin_payload)
-    db = next(override_get_db())
-    admin = db.query(models.User).filter_by(username=admin_payload["username"]).first()
-    assert admin is not None
-    admin.role = "admin"
-    db.add(admin)
-    db.commit()
-    # Login as admin
-    r = client.post("/users/login", json={"username": admin_payload["username"], "password": admin_payload["password"]})
-    assert r.status_code == 200
-    token = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
+    admin_payload, headers = make_admin(db_sessionmaker, "admin100x")
     # List users
     r = client.get("/users/", headers=headers)
     assert r.status_code == 200
@@ -85,21 +58,17 @@ def test_admin_endpoints_and_errors():
     user_payload = unique_user("notadminx", password="pass1234")
     r = client.post("/users/", json=user_payload)
     assert r.status_code == 201
-    r = client.post("/users/login", json={"username": user_payload["username"], "password": user_payload["password"]})
-    token2 = r.json()["access_token"]
-    headers2 = {"Authorization": f"Bearer {token2}"}
+    headers2 = login(client, user_payload)
     r = client.get("/admin/tokens", headers=headers2)
     assert r.status_code == 403
 
 # --- Calculation error branches ---
-def test_calculation_not_found_and_delete():
+def test_calculation_not_found_and_delete(client):
     # Register and login
     user_payload = unique_user("calcuser", password="pass1234")
     r = client.post("/users/register", json=user_payload)
     assert r.status_code == 201
-    r = client.post("/users/login", json={"username": user_payload["username"], "password": user_payload["password"]})
-    token = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
+    headers = login(client, user_payload)
     # Get non-existent calculation
     r = client.get("/calculations/9999", headers=headers)
     assert r.status_code == 404
@@ -112,14 +81,12 @@ def test_calculation_not_found_and_delete():
     assert r.status_code == 404
 
 # --- Token revoke and error branches ---
-def test_token_revoke_errors():
+def test_token_revoke_errors(client):
     # Register and login
     user_payload = unique_user("tokuser", password="pass1234")
     r = client.post("/users/register", json=user_payload)
     assert r.status_code == 201
-    r = client.post("/users/login", json={"username": user_payload["username"], "password": user_payload["password"]})
-    token = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
+    headers = login(client, user_payload)
     # Revoke with invalid token
     r = client.post("/users/me/revoke", json={"refresh_token": "badtoken"}, headers=headers)
     assert r.status_code in (404, 422)
@@ -131,7 +98,7 @@ def test_token_revoke_errors():
     assert r.status_code == 404
 
 # --- Auth error branches ---
-def test_auth_errors():
+def test_auth_errors(client, db_sessionmaker):
     # Invalid login
     r = client.post("/users/login", json={"username": "nope", "password": "bad"})
     assert r.status_code == 401
@@ -151,16 +118,6 @@ def test_auth_errors():
     r = client.post("/users/logout", json={}, headers={"Authorization": "Bearer badtoken"})
     assert r.status_code in (400, 401)
     # Admin revoke by token (not found)
-    # First, login as admin
-    admin_payload = unique_user("admin101")
-    r = client.post("/users/", json=admin_payload)
-    db = next(override_get_db())
-    admin = db.query(models.User).filter_by(username=admin_payload["username"]).first()
-    admin.role = "admin"
-    db.add(admin)
-    db.commit()
-    r = client.post("/users/login", json={"username": admin_payload["username"], "password": admin_payload["password"]})
-    token = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
+    _, headers = make_admin(db_sessionmaker, "admin101")
     r = client.post("/admin/tokens/revoke", json={"refresh_token": "notarealtoken"}, headers=headers)
     assert r.status_code == 404
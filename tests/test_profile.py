@@ -11,23 +11,16 @@ from app.schemas import UserProfileUpdate, PasswordChangeRequest
 class TestUserProfileUpdateSchema:
     """Test UserProfileUpdate schema validation."""
 
-    def test_valid_username_only(self):
-        """Test updating username only."""
-        profile = UserProfileUpdate(username="newuser")
-        assert profile.username == "newuser"
-        assert profile.email is None
-
-    def test_valid_email_only(self):
-        """Test updating email only."""
-        profile = UserProfileUpdate(email="newemail@example.com")
-        assert profile.email == "newemail@example.com"
-        assert profile.username is None
-
-    def test_valid_both_fields(self):
-        """Test updating both username and email."""
-        profile = UserProfileUpdate(username="newuser", email="newemail@example.com")
-        assert profile.username == "newuser"
-        assert profile.email == "newemail@example.com"
+    @pytest.mark.parametrize("fields", [
+        {"username": "newuser"},
+        {"email": "newemail@example.com"},
+        {"username": "newuser", "email": "newemail@example.com"},
+    ], ids=["username_only", "email_only", "both_fields"])
+    def test_valid_update(self, fields):
+        """Test updating any combination of username and email."""
+        profile = UserProfileUpdate(**fields)
+        assert profile.username == fields.get("username")
+        assert profile.email == fields.get("email")
 
     def test_empty_update(self):
         """Test creating update with no fields (should be valid)."""
@@ -87,38 +80,20 @@ class TestPasswordChangeRequestSchema:
             PasswordChangeRequest(current_password="OldPass123!")
         assert "new_password" in str(exc_info.value).lower()
 
-    def test_weak_new_password_no_uppercase(self):
-        """Test that password is accepted (no uppercase requirement in schema)."""
-        # Note: Schema only validates min_length=6, not password complexity
-        request = PasswordChangeRequest(
-            current_password="oldpass123!",
-            new_password="newpass123!"
-        )
-        assert request.new_password == "newpass123!"
-
-    def test_weak_new_password_no_lowercase(self):
-        """Test that password is accepted (no lowercase requirement in schema)."""
-        request = PasswordChangeRequest(
-            current_password="OLDPASS123!",
-            new_password="NEWPASS123!"
-        )
-        assert request.new_password == "NEWPASS123!"
-
-    def test_weak_new_password_no_digit(self):
-        """Test that password is accepted (no digit requirement in schema)."""
-        request = PasswordChangeRequest(
-            current_password="OldPass!",
-            new_password="NewPass!"
-        )
-        assert request.new_password == "NewPass!"
-
-    def test_weak_new_password_no_special(self):
-        """Test that password is accepted (no special char requirement in schema)."""
+    # Note: Schema only validates min_length=6, not password complexity
+    @pytest.mark.parametrize("current,new", [
+        ("oldpass123!", "newpass123!"),
+        ("OLDPASS123!", "NEWPASS123!"),
+        ("OldPass!", "NewPass!"),
+        ("OldPass123", "NewPass123"),
+    ], ids=["no_uppercase", "no_lowercase", "no_digit", "no_special"])
+    def test_weak_new_password_accepted(self, current, new):
+        """Test that passwords lacking a character class are accepted."""
         request = PasswordChangeRequest(
-            current_password="OldPass123",
-            new_password="NewPass123"
+            current_password=current,
+            new_password=new
         )
-        assert request.new_password == "NewPass123"
+        assert request.new_password == new
 
     def test_weak_new_password_too_short(self):
         """Test that password shorter than 6 characters is rejected."""
@@ -6,10 +6,11 @@ def test_usercreate_valid():
     user = UserCreate(username="testuser", email="test@example.com", password="securepass")
     assert user.username == "testuser"
 
-def test_usercreate_invalid_email():
+@pytest.mark.parametrize("overrides", [
+    {"email": "not-an-email"},
+    {"password": "123"},
+], ids=["invalid_email", "short_password"])
+def test_usercreate_invalid(overrides):
+    kwargs = {"username": "testuser", "email": "test@example.com", "password": "securepass", **overrides}
     with pytest.raises(ValidationError):
-        UserCreate(username="testuser", email="not-an-email", password="securepass")
-
-def test_usercreate_short_password():
-    with pytest.raises(ValidationError):
-        UserCreate(username="testuser", email="test@example.com", password="123")
+        UserCreate(**kwargs)
@@ -1,8 +1,19 @@
+import pytest
+
 from app.security import hash_password, verify_password
 
-def test_hash_and_verify_password():
-    plain = "mysecretpassword"
-    hashed = hash_password(plain)
-    assert hashed != plain
-    assert verify_password(plain, hashed) is True
-    assert verify_password("wrongpassword", hashed) is False
+PLAIN = "mysecretpassword"
+
+
+@pytest.fixture(scope="module")
+def hashed():
+    return hash_password(PLAIN)
+
+
+def test_hash_password(hashed):
+    assert hashed != PLAIN
+
+
+@pytest.mark.parametrize("plain,ok", [(PLAIN, True), ("wrongpassword", False)])
+def test_verify_password(hashed, plain, ok):
+    assert verify_password(plain, hashed) is ok
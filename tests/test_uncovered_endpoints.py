@@ -1,62 +1,41 @@
 """
 Tests for uncovered endpoints and error conditions in main.py
 """
+from datetime import datetime, timedelta, timezone
+
+import jwt
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import insert
 from app.main import app
-from app.database import Base, get_db
+from app.database import get_db
 from app import models, schemas
-from app.security import hash_password, create_access_token
-import uuid
-
-
-TEST_DATABASE_URL = "sqlite:///./test_coverage.db"
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from app.security import ALGORITHM, SECRET_KEY, hash_password, create_access_token
 
+# Every test runs in a transaction that is rolled back afterwards; see
+# db_sessionmaker in tests/conftest.py.
+pytestmark = pytest.mark.usefixtures("db_sessionmaker")
 
-@pytest.fixture(scope="function", autouse=True)
-def setup_database():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+# Every test user shares one password, so hash it once for the module
+_PASSWORD_HASH = hash_password("password123")
 
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# A validly signed token that has no "sub" claim
+_NO_SUB_TOKEN = jwt.encode(
+    {
+        "exp": datetime.now(timezone.utc) + timedelta(days=365),
+        "iat": datetime.now(timezone.utc),
+    },
+    SECRET_KEY,
+    algorithm=ALGORITHM,
+)
 
 
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
-
-
-@pytest.fixture(autouse=True)
-def apply_db_override():
-    """Ensure the overridden DB is used and reset per test."""
-    app.dependency_overrides[get_db] = override_get_db
-    yield
-    app.dependency_overrides.pop(get_db, None)
-
-
-def create_test_user(username=None, email=None, role="user"):
+def create_test_user(session_local, username, email, role="user"):
     """Helper to create a test user."""
-    if username is None:
-        unique = str(uuid.uuid4())[:8]
-        username = f"testuser_{unique}"
-        email = f"test_{unique}@example.com"
-    
-    db = TestingSessionLocal()
+    db = session_local()
     user = models.User(
         username=username,
         email=email,
-        password_hash=hash_password("password123"),
+        password_hash=_PASSWORD_HASH,
         role=role
     )
     db.add(user)
@@ -66,7 +45,57 @@ def create_test_user(username=None, email=None, role="user"):
     return user
 
 
-def test_get_current_user_invalid_token():
+def create_test_users(session_local, specs):
+    """Helper to create several test users with a single INSERT."""
+    db = session_local()
+    db.execute(
+        insert(models.User),
+        [{"role": "user", **spec, "password_hash": _PASSWORD_HASH} for spec in specs],
+    )
+    db.commit()
+    db.close()
+
+
+@pytest.fixture(scope="module")
+def admin_auth(committed_sessionmaker):
+    """An admin user and access token shared by the module's admin tests."""
+    admin_user = create_test_user(committed_sessionmaker, "admin", "admin@test.com", role="admin")
+    return admin_user, create_access_token(subject=admin_user.username)
+
+
+@pytest.fixture(scope="module")
+def user_token(committed_sessionmaker):
+    """A regular user and access token shared by the module's tests."""
+    user = create_test_user(committed_sessionmaker, "tokenuser", "tokenuser@test.com")
+    return user, create_access_token(subject=user.username)
+
+
+@pytest.fixture(scope="module")
+def logged_in_user(client, committed_sessionmaker):
+    """A regular user logged in once, with the tokens the login returned.
+
+    The login commits through committed_sessionmaker too, so every test
+    starts with the refresh token unrevoked, whichever earlier test revoked it.
+    """
+    user = create_test_user(committed_sessionmaker, "loginuser", "loginuser@test.com")
+
+    def login_db():
+        with committed_sessionmaker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = login_db
+    try:
+        response = client.post(
+            "/users/login",
+            json={"username": user.username, "password": "password123"}
+        )
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    assert response.status_code == 200, response.text
+    return user, response.json()
+
+
+def test_get_current_user_invalid_token(client):
     """Test get_current_user with invalid token."""
     response = client.get(
         "/calculations",
@@ -76,28 +105,16 @@ def test_get_current_user_invalid_token():
     assert "Invalid authentication credentials" in response.json()["detail"]
 
 
-def test_get_current_user_no_subject():
+def test_get_current_user_no_subject(client):
     """Test get_current_user when token has no subject."""
-    # Create a token without 'sub' field
-    import jwt
-    from app.security import SECRET_KEY, ALGORITHM
-    from datetime import datetime, timedelta, timezone
-    
-    token_data = {
-        "exp": datetime.now(timezone.utc) + timedelta(hours=1),
-        "iat": datetime.now(timezone.utc)
-        # Missing "sub" field
-    }
-    token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
-    
     response = client.get(
         "/calculations",
-        headers={"Authorization": f"Bearer {token}"}
+        headers={"Authorization": f"Bearer {_NO_SUB_TOKEN}"}
     )
     assert response.status_code == 401
 
 
-def test_get_current_user_user_not_found():
+def test_get_current_user_user_not_found(client):
     """Test get_current_user when user doesn't exist in database."""
     # Create token for non-existent user
     token = create_access_token(subject="nonexistent_user")
@@ -110,11 +127,9 @@ def test_get_current_user_user_not_found():
     assert "User not found" in response.json()["detail"]
 
 
-def test_require_role_insufficient_privileges():
+def test_require_role_insufficient_privileges(client, user_token):
     """Test require_role decorator with insufficient privileges."""
-    # Create regular user
-    user = create_test_user(role="user")
-    token = create_access_token(subject=user.username)
+    _, token = user_token
     
     # Try to access admin endpoint
     response = client.get(
@@ -125,10 +140,9 @@ def test_require_role_insufficient_privileges():
     assert "Insufficient privileges" in response.json()["detail"]
 
 
-def test_revoke_my_token_by_string_not_found():
+def test_revoke_my_token_by_string_not_found(client, user_token):
     """Test /users/me/revoke when token not found."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
+    _, token = user_token
     
     # Try to revoke non-existent refresh token
     response = client.post(
@@ -140,18 +154,9 @@ def test_revoke_my_token_by_string_not_found():
     assert "refresh token not found" in response.json()["detail"]
 
 
-def test_revoke_my_token_by_string_success():
+def test_revoke_my_token_by_string_success(client, logged_in_user):
     """Test successful token revocation via /users/me/revoke."""
-    # Create user
-    user = create_test_user()
-    
-    # Login to get refresh token
-    login_response = client.post(
-        "/users/login",
-        json={"username": user.username, "password": "password123"}
-    )
-    assert login_response.status_code == 200
-    tokens = login_response.json()
+    _, tokens = logged_in_user
     access_token = tokens["access_token"]
     refresh_token = tokens["refresh_token"]
     
@@ -172,12 +177,10 @@ def test_revoke_my_token_by_string_success():
     assert refresh_response.status_code == 401
 
 
-def test_admin_endpoints_with_admin_user():
+def test_admin_endpoints_with_admin_user(client, admin_auth):
     """Test admin endpoints with admin user."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Test admin/tokens endpoint
     response = client.get(
         "/admin/tokens",
@@ -193,15 +196,15 @@ def test_admin_endpoints_with_admin_user():
     assert response.status_code == 200
 
 
-def test_list_users_endpoint():
+def test_list_users_endpoint(client, db_sessionmaker, admin_auth):
     """Test /users/ endpoint (admin only)."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Create some regular users
-    create_test_user(username="user1", email="user1@test.com")
-    create_test_user(username="user2", email="user2@test.com")
+    create_test_users(db_sessionmaker, [
+        {"username": "user1", "email": "user1@test.com"},
+        {"username": "user2", "email": "user2@test.com"},
+    ])
     
     # List users
     response = client.get(
@@ -213,14 +216,12 @@ def test_list_users_endpoint():
     assert len(users) >= 3  # admin + 2 regular users
 
 
-def test_set_user_role():
+def test_set_user_role(client, db_sessionmaker, admin_auth):
     """Test /users/{username}/role endpoint."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Create regular user
-    user = create_test_user(username="testuser", email="test@test.com", role="user")
+    user = create_test_user(db_sessionmaker, username="testuser", email="test@test.com", role="user")
     
     # Change user role
     response = client.post(
@@ -232,12 +233,10 @@ def test_set_user_role():
     assert response.json()["role"] == "moderator"
 
 
-def test_set_user_role_user_not_found():
+def test_set_user_role_user_not_found(client, admin_auth):
     """Test /users/{username}/role with non-existent user."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Try to change role of non-existent user
     response = client.post(
         "/users/nonexistent/role",
@@ -248,19 +247,11 @@ def test_set_user_role_user_not_found():
     assert "User not found" in response.json()["detail"]
 
 
-def test_revoke_all_for_user():
+def test_revoke_all_for_user(client, admin_auth, logged_in_user):
     """Test /users/{username}/revoke_all endpoint."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
-    # Create regular user and login
-    user = create_test_user(username="testuser", email="test@test.com")
-    login_response = client.post(
-        "/users/login",
-        json={"username": user.username, "password": "password123"}
-    )
-    
+    _, admin_token = admin_auth
+    user, _ = logged_in_user
+
     # Revoke all tokens for user
     response = client.post(
         f"/users/{user.username}/revoke_all",
@@ -270,12 +261,10 @@ def test_revoke_all_for_user():
     assert response.json()["msg"] == "revoked all"
 
 
-def test_revoke_all_for_nonexistent_user():
+def test_revoke_all_for_nonexistent_user(client, admin_auth):
     """Test /users/{username}/revoke_all with non-existent user."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Try to revoke tokens for non-existent user
     response = client.post(
         "/users/nonexistent/revoke_all",
@@ -284,19 +273,11 @@ def test_revoke_all_for_nonexistent_user():
     assert response.status_code == 404
 
 
-def test_admin_list_tokens_for_user():
+def test_admin_list_tokens_for_user(client, admin_auth, logged_in_user):
     """Test /admin/users/{username}/tokens endpoint."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
-    # Create user and login to generate tokens
-    user = create_test_user(username="testuser", email="test@test.com")
-    client.post(
-        "/users/login",
-        json={"username": user.username, "password": "password123"}
-    )
-    
+    _, admin_token = admin_auth
+    user, _ = logged_in_user
+
     # List tokens for user
     response = client.get(
         f"/admin/users/{user.username}/tokens",
@@ -307,12 +288,10 @@ def test_admin_list_tokens_for_user():
     assert len(tokens) > 0
 
 
-def test_admin_list_tokens_for_nonexistent_user():
+def test_admin_list_tokens_for_nonexistent_user(client, admin_auth):
     """Test /admin/users/{username}/tokens with non-existent user."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Try to list tokens for non-existent user
     response = client.get(
         "/admin/users/nonexistent/tokens",
@@ -321,19 +300,10 @@ def test_admin_list_tokens_for_nonexistent_user():
     assert response.status_code == 404
 
 
-def test_admin_revoke_by_token():
+def test_admin_revoke_by_token(client, admin_auth, logged_in_user):
     """Test /admin/tokens/revoke endpoint."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
-    # Create user and login
-    user = create_test_user()
-    login_response = client.post(
-        "/users/login",
-        json={"username": user.username, "password": "password123"}
-    )
-    refresh_token = login_response.json()["refresh_token"]
+    _, admin_token = admin_auth
+    refresh_token = logged_in_user[1]["refresh_token"]
     
     # Admin revokes the token
     response = client.post(
@@ -345,12 +315,10 @@ def test_admin_revoke_by_token():
     assert response.json()["msg"] == "revoked"
 
 
-def test_admin_revoke_nonexistent_token():
+def test_admin_revoke_nonexistent_token(client, admin_auth):
     """Test /admin/tokens/revoke with non-existent token."""
-    # Create admin user
-    admin_user = create_test_user(username="admin", email="admin@test.com", role="admin")
-    admin_token = create_access_token(subject=admin_user.username)
-    
+    _, admin_token = admin_auth
+
     # Try to revoke non-existent token
     response = client.post(
         "/admin/tokens/revoke",
@@ -361,61 +329,29 @@ def test_admin_revoke_nonexistent_token():
     assert "Token not found" in response.json()["detail"]
 
 
-def test_calculation_read_not_found():
-    """Test reading non-existent calculation."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
-    
-    response = client.get(
-        "/calculations/99999",
-        headers={"Authorization": f"Bearer {token}"}
-    )
-    assert response.status_code == 404
-    assert "Calculation not found" in response.json()["detail"]
-
+@pytest.mark.parametrize("method, payload", [
+    ("get", None),
+    ("put", {"a": 10, "b": 5, "type": "Add"}),
+    ("patch", {"a": 10}),
+    ("delete", None),
+], ids=["get", "put", "patch", "delete"])
+def test_calculation_not_found(client, user_token, method, payload):
+    """Test reading, updating, patching and deleting a non-existent calculation."""
+    _, token = user_token
+    kwargs = {} if payload is None else {"json": payload}
 
-def test_calculation_update_not_found():
-    """Test updating non-existent calculation."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
-    
-    response = client.put(
+    response = getattr(client, method)(
         "/calculations/99999",
-        json={"a": 10, "b": 5, "type": "Add"},
-        headers={"Authorization": f"Bearer {token}"}
-    )
-    assert response.status_code == 404
-
-
-def test_calculation_patch_not_found():
-    """Test patching non-existent calculation."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
-    
-    response = client.patch(
-        "/calculations/99999",
-        json={"a": 10},
-        headers={"Authorization": f"Bearer {token}"}
-    )
-    assert response.status_code == 404
-
-
-def test_calculation_delete_not_found():
-    """Test deleting non-existent calculation."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
-    
-    response = client.delete(
-        "/calculations/99999",
-        headers={"Authorization": f"Bearer {token}"}
+        headers={"Authorization": f"Bearer {token}"},
+        **kwargs
     )
     assert response.status_code == 404
+    assert "Calculation not found" in response.json()["detail"]
 
 
-def test_calculation_patch_success():
+def test_calculation_patch_success(client, user_token):
     """Test successful PATCH of calculation."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
+    _, token = user_token
     
     # Create calculation
     create_response = client.post(
@@ -438,7 +374,7 @@ def test_calculation_patch_success():
     assert updated["result"] == 20  # recomputed
 
 
-def test_user_login_missing_credentials():
+def test_user_login_missing_credentials(client):
     """Test login without username or email."""
     response = client.post(
         "/users/login",
@@ -448,7 +384,7 @@ def test_user_login_missing_credentials():
     assert "username or email required" in response.json()["detail"]
 
 
-def test_refresh_token_missing():
+def test_refresh_token_missing(client):
     """Test refresh without token."""
     response = client.post(
         "/users/refresh",
@@ -457,10 +393,9 @@ def test_refresh_token_missing():
     assert response.status_code == 400
 
 
-def test_logout_missing_token():
+def test_logout_missing_token(client, user_token):
     """Test logout without refresh token."""
-    user = create_test_user()
-    token = create_access_token(subject=user.username)
+    _, token = user_token
     
     response = client.post(
         "/users/logout",